@@ -24,18 +24,205 @@ Input file format examples:
 """
 
 import argparse
+import contextlib
 import csv
+import io
+import itertools
 import logging
+import multiprocessing
+import os
+import stat
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple, Union
 
 import colorama
 from colorama import Fore, Style
 
+try:
+    import polars as pl
+except ImportError:  # polars is optional; fall back to the csv module
+    pl = None
+
 # Initialize colorama
 colorama.init(autoreset=True)
 
+# Temporary column names used while joining the dataset and target tables
+_ID_KEY = "__xymaker_id"
+_LABEL_KEY = "__xymaker_label"
+
+# Buffer size for the CSV file handles; larger buffers mean fewer read/write syscalls
+IO_BUFFER_SIZE = 1 << 20
+
+# Files at least this large are parsed in parallel by the csv fallback
+PARALLEL_READ_THRESHOLD = 64 * 1024 * 1024
+
+# Number of unmatched IDs shown in the console summary
+UNMATCHED_SAMPLE_SIZE = 20
+
+# Approximate amount of dataset text (in characters) handed to the matcher at a time.
+# Batching by size rather than line count keeps memory bounded for wide feature tables.
+ALIGN_BATCH_SIZE = 4 * 1024 * 1024
+
+
+def _stat_or_none(filename: str) -> Optional[os.stat_result]:
+    """
+    Stat a file, returning None instead of raising when it can't be accessed.
+    
+    Args:
+        filename: Path to the file
+        
+    Returns:
+        The os.stat result, or None if the file doesn't exist or can't be accessed
+    """
+    try:
+        return os.stat(filename)
+    except OSError:
+        return None
+
+
+@contextlib.contextmanager
+def _replace_on_success(*filenames: str) -> Iterator[List[str]]:
+    """
+    Provide temporary paths for output files and move them into place only on success.
+    
+    If the block raises, the temporary files are deleted and any existing outputs are
+    left untouched instead of being replaced by truncated ones.
+    
+    Args:
+        filenames: Final output paths
+        
+    Yields:
+        A temporary path for each output file, in the same order
+    """
+    # Same directory, so os.replace is a rename; the original name stays at the end
+    # so the suffix still tells the output format
+    temp_names = [
+        os.path.join(os.path.dirname(filename), f".tmp-{os.getpid()}-{os.path.basename(filename)}")
+        for filename in filenames
+    ]
+    try:
+        try:
+            yield temp_names
+        except OSError as e:
+            # Report errors such as a missing output directory against the requested name
+            if e.filename in temp_names:
+                e.filename = filenames[temp_names.index(e.filename)]
+            raise
+        for temp_name, filename in zip(temp_names, filenames):
+            os.replace(temp_name, filename)
+    finally:
+        for temp_name in temp_names:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_name)
+
+
+def _parse_label_chunk(task: Tuple[str, int, int, str, int]) -> List[Tuple[str, str]]:
+    """
+    Parse the (ID, label) pairs found in a byte range of a target CSV file.
+    
+    Runs in a worker process, so it lives at module level to be picklable.
+    Only the two needed fields are sent back, not the whole rows.
+    
+    Args:
+        task: Tuple of (filename, start offset, end offset, delimiter, label column)
+        
+    Returns:
+        List of (ID, label) pairs for the rows that have the label column
+    """
+    filename, start, end, delimiter, column = task
+    with open(filename, 'rb') as csvfile:
+        csvfile.seek(start)
+        chunk = csvfile.read(end - start)
+    text = io.StringIO(chunk.decode('utf-8'), newline='')
+    return [(row[0], row[column]) for row in csv.reader(text, delimiter=delimiter) if len(row) > column]
+
+
+def _join_quoted_lines(lines: List[str], more_lines: Iterator[str], delimiter: str) -> List[str]:
+    """
+    Rejoin the physical lines of records whose quoted fields contain line breaks.
+    
+    Only a line with an odd number of quote characters can leave a field open. For
+    those the csv module decides where the record ends, taking continuation lines
+    from the rest of the batch and then from more_lines.
+    
+    Args:
+        lines: Batch of raw dataset lines
+        more_lines: The rest of the dataset file, for records that run past the batch
+        delimiter: CSV delimiter character
+        
+    Returns:
+        The batch as whole records, each the verbatim text of its lines
+    """
+    # Searching the joined batch once is much cheaper than counting quotes line by line
+    if '"' not in "".join(lines) or not any([line.count('"') % 2 for line in lines]):
+        return lines
+    
+    remaining = iter(lines)
+    following = itertools.chain(remaining, more_lines)
+    records = []
+    
+    for line in remaining:
+        if line.count('"') % 2:
+            record_lines = [line]
+            
+            def physical_lines() -> Iterator[str]:
+                yield record_lines[0]
+                for extra in following:
+                    record_lines.append(extra)
+                    yield extra
+            
+            # csv.reader pulls lines only until the record is complete
+            next(csv.reader(physical_lines(), delimiter=delimiter), None)
+            line = "".join(record_lines)
+        records.append(line)
+    
+    return records
+
+
+def _align_lines(
+    lines: List[str],
+    delimiter: str,
+    labels: Dict[str, int]
+) -> Tuple[List[int], List[int], List[str]]:
+    """
+    Match a batch of dataset lines against the labels dictionary by ID.
+    
+    Args:
+        lines: Raw dataset lines
+        delimiter: CSV delimiter character
+        labels: Dictionary mapping IDs to label codes
+        
+    Returns:
+        Tuple of (matched line indices, matched label codes, unmatched IDs)
+    """
+    matched_idx = []
+    matched_codes = []
+    unmatched_ids = []
+    
+    for i, line in enumerate(lines):
+        # Skip blank lines, including ones made only of delimiters (records with no fields)
+        if not line.rstrip('\r\n').strip(delimiter):
+            continue
+        
+        record_id = line.split(delimiter, 1)[0]
+        if record_id.startswith('"'):
+            # Quoted IDs need the csv module to strip quotes and escapes
+            record_id = next(csv.reader([line], delimiter=delimiter))[0]
+        
+        code = labels.get(record_id)
+        if code is not None:
+            matched_idx.append(i)
+            matched_codes.append(code)
+        else:
+            unmatched_ids.append(record_id)
+    
+    return matched_idx, matched_codes, unmatched_ids
+
+
+# Code paths selectable with --engine; "auto" uses polars only when Parquet output asks for it
+ENGINES = ("auto", "polars", "csv")
+
 
 class XYMaker:
     """Creates aligned X and Y data files from unordered dataset and target files."""
@@ -47,7 +234,11 @@ class XYMaker:
         column: int = 1, 
         x_filename: str = "x.csv", 
         y_filename: str = "y.csv",
-        delimiter: str = ','
+        delimiter: str = ',',
+        unmatched_log: Optional[str] = None,
+        output_format: Optional[str] = None,
+        target_size: Optional[int] = None,
+        engine: str = "auto"
     ):
         """
         Initialize the XYMaker with file paths and processing options.
@@ -59,6 +250,10 @@ class XYMaker:
             x_filename: Output filename for features
             y_filename: Output filename for labels
             delimiter: CSV delimiter character
+            unmatched_log: Optional path of a file listing every unmatched ID
+            output_format: "csv" or "parquet"; detected from each output file suffix when None
+            target_size: Size of the labels file in bytes, if already known
+            engine: One of ENGINES; "polars" forces the polars join and "csv" the csv module path
         """
         self.features_file = features_file
         self.label_file = label_file
@@ -66,12 +261,13 @@ class XYMaker:
         self.output_x_filename = x_filename
         self.output_y_filename = y_filename
         self.delimiter = delimiter
+        self.unmatched_log = unmatched_log
+        self.output_format = output_format
+        self.target_size = target_size
+        self.engine = engine
         
         # Data containers
-        self.features_data: List[List[str]] = []
-        self.labels_data: List[List[str]] = []
-        self.aligned_x_data: List[List[str]] = []
-        self.aligned_y_data: List[List[str]] = []
+        self.features_table: Optional["pl.LazyFrame"] = None
     
     def process(self) -> Tuple[int, int]:
         """
@@ -80,133 +276,461 @@ class XYMaker:
         Returns:
             Tuple containing (number of matched records, number of unmatched records)
         """
-        # Read input files
-        self.features_data = self._read_csv(self.features_file)
-        self.labels_data = self._read_csv(self.label_file)
+        if self.engine == "polars" and pl is None:
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} The polars engine requires polars to be installed")
+            return (0, 0)
+        
+        # Parquet is written by polars; the csv fallback can only produce CSV
+        output_formats = {self._output_format(self.output_x_filename), self._output_format(self.output_y_filename)}
+        if "parquet" in output_formats and (pl is None or self.engine == "csv"):
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} Parquet output requires polars to be installed "
+                          f"and the polars or auto engine")
+            return (0, 0)
+        
+        # The target size decides whether it is parsed in parallel; only stat it if the caller didn't
+        if self.target_size is None:
+            target_stat = _stat_or_none(self.label_file)
+            self.target_size = target_stat.st_size if target_stat else 0
+        
+        # The csv path is faster and lighter on memory at every input size measured, and copies
+        # dataset lines verbatim, so polars only runs when asked for or needed to write Parquet
+        use_polars = self.engine == "polars" or (self.engine == "auto" and "parquet" in output_formats)
         
-        if not self.features_data or not self.labels_data:
+        # The target file is read with the csv module on both paths. It only has to fill the
+        # ID hash table, and csv.reader tells empty label fields apart from missing ones,
+        # which polars would both read as null.
+        label_rows = self._iter_csv(self.label_file)
+        labels_header = self._read_header(label_rows, self.label_file)
+        
+        if not labels_header:
             logging.error("One or both input files are empty or couldn't be read")
             return (0, 0)
         
         # Validate column index
-        if self.column >= len(self.labels_data[0]):
+        if self.column >= len(labels_header):
             logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} Column index {self.column} is greater than "
-                         f"the number of columns in target file ({len(self.labels_data[0])})")
+                         f"the number of columns in target file ({len(labels_header)})")
             return (0, 0)
         
         # Get label column name
-        label_column_name = self.labels_data[0][self.column]
+        label_column_name = labels_header[self.column]
         print(f"Using label column: {label_column_name}")
         
-        # Store the header for the X file
-        x_header = self.features_data[0]
-        self.aligned_x_data.append(x_header)
+        # Create a dictionary for fast lookup of labels by ID
+        try:
+            labels_dict, label_values = self._create_labels_dict(self._iter_labels(label_rows))
+        except Exception as e:
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} Failed to read {self.label_file}: {str(e)}")
+            return (0, 0)
         
-        # Create a header for Y file with the label name
-        self.aligned_y_data.append([label_column_name])
+        # With polars the dataset file is scanned lazily and streamed from disk
+        if use_polars:
+            self.features_table = self._scan_table(self.features_file)
+            
+            if self.features_table is None:
+                logging.error("One or both input files are empty or couldn't be read")
+                return (0, 0)
+            
+            return self._join_tables(label_column_name, labels_dict, label_values)
         
-        # Create a dictionary for fast lookup of labels by ID
-        labels_dict = self._create_labels_dict()
+        try:
+            # Align the data, copying matched dataset lines as they are found instead of buffering them
+            with open(self.features_file, 'r', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as features:
+                features_header = features.readline()
+                if not features_header:
+                    logging.error("One or both input files are empty or couldn't be read")
+                    return (0, 0)
+                
+                with _replace_on_success(self.output_x_filename, self.output_y_filename) as (x_temp, y_temp), \
+                        open(x_temp, 'w', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as x_file, \
+                        open(y_temp, 'w', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as y_file:
+                    y_writer = csv.writer(y_file, delimiter=self.delimiter, lineterminator='\n')
+                    
+                    # Headers: the original features header and the label column name
+                    x_file.write(features_header)
+                    y_writer.writerow([label_column_name])
+                    
+                    matched, unmatched_ids = self._align_data(
+                        labels_dict, label_values, features, x_file, y_writer
+                    )
+        except FileNotFoundError as e:
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} File {e.filename} not found")
+            return (0, 0)
+        except PermissionError as e:
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} No permission to access {e.filename}")
+            return (0, 0)
+        except Exception as e:
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} Failed to align data: {str(e)}")
+            return (0, 0)
+        
+        print(f"Successfully saved {self.output_x_filename}")
+        print(f"Successfully saved {self.output_y_filename}")
+        
+        self._report_unmatched(unmatched_ids)
+        
+        return matched, len(unmatched_ids)
+    
+    def _join_tables(
+        self,
+        label_column_name: str,
+        labels_dict: Dict[str, int],
+        label_values: List[str]
+    ) -> Tuple[int, int]:
+        """
+        Align features with labels through a single hash join on the ID columns.
+        
+        The join is built lazily and sunk straight to the output files, so only the
+        ID hash table has to fit in memory rather than the full datasets.
+        
+        Args:
+            label_column_name: Name of the selected label column in the target file
+            labels_dict: Dictionary mapping IDs to label codes
+            label_values: Distinct label values indexed by code
+            
+        Returns:
+            Tuple of (matched_count, unmatched_count)
+        """
+        feature_id = self.features_table.collect_schema().names()[0]
+        
+        # Blank lines come through as all-null rows; the csv path skips them
+        features = self.features_table.filter(~pl.all_horizontal(pl.all().is_null()))
+        
+        # The labels dictionary already holds one valid label per ID, selected exactly as
+        # on the csv path. Its columns use names that can't collide with feature columns.
+        labels = pl.LazyFrame(
+            {
+                _ID_KEY: list(labels_dict),
+                _LABEL_KEY: [label_values[code] for code in labels_dict.values()],
+            },
+            schema={_ID_KEY: pl.String, _LABEL_KEY: pl.String},
+        )
         
-        # Align the data
-        matched, unmatched = self._align_data(labels_dict)
+        # An empty ID field is read as null; match and report it as "" like the csv path does
+        feature_key = pl.col(feature_id).fill_null("")
         
-        # Save the aligned data
-        self._save_csv(self.output_x_filename, self.aligned_x_data)
-        self._save_csv(self.output_y_filename, self.aligned_y_data)
+        # A left join keeps every record, so the outputs and the counts all come from one pass.
+        # cache() marks the join as shared by all three queries below.
+        joined = features.join(
+            labels, left_on=feature_key, right_on=_ID_KEY, how="left", maintain_order="left"
+        ).cache()
+        is_matched = pl.col(_LABEL_KEY).is_not_null()
+        matched = joined.filter(is_matched)
+        stats = joined.select(
+            pl.len().alias("total"),
+            feature_key.filter(~is_matched).implode().alias("unmatched"),
+        )
         
-        return matched, unmatched
+        # Stream the aligned data to disk; collect_all runs the sinks and the counts as a
+        # single plan, so the dataset file is scanned and the labels hashed only once
+        try:
+            with open(self.features_file, 'r', newline='', encoding='utf-8') as features:
+                features_header = features.readline()
+            
+            with _replace_on_success(self.output_x_filename, self.output_y_filename) as (x_temp, y_temp), \
+                    contextlib.ExitStack() as output_files:
+                _, _, stats = pl.collect_all([
+                    self._sink_query(
+                        x_temp,
+                        matched.drop(_LABEL_KEY, _ID_KEY, strict=False),
+                        output_files,
+                        header=features_header,
+                    ),
+                    self._sink_query(
+                        y_temp,
+                        matched.select(pl.col(_LABEL_KEY).alias(label_column_name)),
+                        output_files,
+                    ),
+                    stats,
+                ])
+        except FileNotFoundError as e:
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} File {e.filename} not found")
+            return (0, 0)
+        except PermissionError as e:
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} No permission to write to {e.filename}")
+            return (0, 0)
+        except Exception as e:
+            # polars appends hints about its own API options after the first line; keep only the error
+            message = str(e).split('\n', 1)[0]
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} Failed to save aligned data: {message}")
+            return (0, 0)
+        
+        print(f"Successfully saved {self.output_x_filename}")
+        print(f"Successfully saved {self.output_y_filename}")
+        
+        total_count = stats["total"].item()
+        unmatched_ids = stats["unmatched"].item().to_list()
+        self._report_unmatched(unmatched_ids)
+        
+        return total_count - len(unmatched_ids), len(unmatched_ids)
     
-    def _create_labels_dict(self) -> Dict[str, str]:
+    def _create_labels_dict(self, labels: Iterator[Tuple[str, str]]) -> Tuple[Dict[str, int], List[str]]:
         """
-        Create a dictionary mapping IDs to their corresponding label values.
+        Create a dictionary mapping IDs to codes of their corresponding label values.
+        
+        Each distinct label is stored once and IDs refer to it by its position, so
+        ML class labels repeated across many records cost a small int per ID
+        instead of a separate string.
         
+        Args:
+            labels: (ID, label) pairs from the target file, in file order
+            
         Returns:
-            Dictionary with ID as key and label value as value
+            Tuple of (dictionary with ID as key and label code as value,
+            list of distinct label values indexed by code)
         """
-        labels_dict = {}
-        # Skip the header row (index 0)
-        for row in self.labels_data[1:]:
-            if row and len(row) > self.column:
-                labels_dict[row[0]] = row[self.column]
-        return labels_dict
-    
-    def _align_data(self, labels_dict: Dict[str, str]) -> Tuple[int, int]:
+        codes: Dict[str, int] = {}
+        # Later duplicates of an ID overwrite earlier ones.
+        # Interned keys share storage with any other copy of the same ID string.
+        labels_dict = {
+            sys.intern(record_id): codes.setdefault(label, len(codes))
+            for record_id, label in labels
+        }
+        # Dictionaries keep insertion order, so codes follow the order of first appearance
+        return labels_dict, list(codes)
+    
+    def _align_data(
+        self,
+        labels_dict: Dict[str, int],
+        label_values: List[str],
+        features: TextIO,
+        x_file: TextIO,
+        y_writer: Any
+    ) -> Tuple[int, List[str]]:
         """
         Align features with corresponding labels based on IDs.
         
+        Dataset lines are not tokenized: only the leading ID field is split off,
+        and matched lines are copied to the X file verbatim. A record whose quoted
+        field contains line breaks is kept together as one multi-line record. Lines
+        are matched in batches, so output is written in a few large calls rather
+        than one per line.
+        
         Args:
-            labels_dict: Dictionary mapping IDs to labels
+            labels_dict: Dictionary mapping IDs to label codes
+            label_values: Distinct label values indexed by code
+            features: Dataset file positioned after its header line
+            x_file: Output file receiving the matched feature lines
+            y_writer: csv writer receiving the matched labels
             
         Returns:
-            Tuple of (matched_count, unmatched_count)
+            Tuple of (matched_count, unmatched_ids)
         """
         matched_count = 0
-        unmatched_count = 0
+        unmatched_ids = []
         
-        # Skip the header row (index 0)
-        for row in self.features_data[1:]:
-            if not row:
-                continue
-                
-            record_id = row[0]
-            if record_id in labels_dict:
-                self.aligned_x_data.append(row)
-                self.aligned_y_data.append([labels_dict[record_id]])
-                matched_count += 1
-            else:
-                print(f"{Fore.BLUE}Info:{Style.RESET_ALL} No match found for ID {record_id} in target file")
-                unmatched_count += 1
+        while True:
+            lines = features.readlines(ALIGN_BATCH_SIZE)
+            if not lines:
+                break
+            lines = _join_quoted_lines(lines, features, self.delimiter)
+            
+            # Only the final line of the file can lack a line break
+            if not lines[-1].endswith('\n'):
+                lines[-1] += '\n'
+            
+            matched_idx, matched_codes, batch_unmatched = _align_lines(lines, self.delimiter, labels_dict)
+            x_file.writelines([lines[i] for i in matched_idx])
+            y_writer.writerows([label_values[code]] for code in matched_codes)
+            matched_count += len(matched_idx)
+            unmatched_ids.extend(batch_unmatched)
                 
-        return matched_count, unmatched_count
+        return matched_count, unmatched_ids
+    
+    def _report_unmatched(self, unmatched_ids: List[str]) -> None:
+        """
+        Print a single summary of the dataset IDs missing from the target file.
+        
+        Printing once instead of per ID keeps terminal I/O out of the matching loop.
+        The full list is written to the unmatched log file when one was requested.
+        
+        Args:
+            unmatched_ids: IDs of the dataset records without a label
+        """
+        if unmatched_ids:
+            sample = ", ".join(unmatched_ids[:UNMATCHED_SAMPLE_SIZE])
+            more = " ..." if len(unmatched_ids) > UNMATCHED_SAMPLE_SIZE else ""
+            print(f"{Fore.BLUE}Info:{Style.RESET_ALL} No match found in target file for "
+                  f"{len(unmatched_ids)} IDs: {sample}{more}")
+        
+        # The log is written even when empty, so a previous run's list doesn't linger
+        if self.unmatched_log:
+            try:
+                with open(self.unmatched_log, 'w', encoding='utf-8') as log_file:
+                    log_file.writelines(f"{record_id}\n" for record_id in unmatched_ids)
+                print(f"Unmatched IDs written to {self.unmatched_log}")
+            except PermissionError:
+                logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} No permission to write to {self.unmatched_log}")
+            except Exception as e:
+                logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} Failed to save {self.unmatched_log}: {str(e)}")
     
-    def _read_csv(self, filename: str) -> List[List[str]]:
+    def _scan_table(self, filename: str) -> Optional["pl.LazyFrame"]:
         """
-        Read data from a CSV file into a list of lists.
+        Lazily scan a CSV file with polars, keeping every column as text.
         
         Args:
             filename: Path to the CSV file
             
         Returns:
-            List of rows, where each row is a list of field values
+            LazyFrame over the file contents, or None if it couldn't be read
         """
-        data = []
         try:
-            with open(filename, 'r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile, delimiter=self.delimiter)
-                for row in reader:
-                    data.append(row)
-            return data
+            # infer_schema=False keeps IDs such as "01" intact instead of parsing them as integers.
+            # Rows with more fields than the header make the query fail rather than lose data.
+            table = pl.scan_csv(filename, separator=self.delimiter, infer_schema=False)
+            # Resolving the schema reads the header, surfacing missing or empty files here
+            table.collect_schema()
+            return table
         except FileNotFoundError:
             logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} File {filename} not found")
         except PermissionError:
             logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} No permission to read {filename}")
         except Exception as e:
             logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} Failed to read {filename}: {str(e)}")
-        return []
+        return None
     
-    def _save_csv(self, filename: str, data: List[List[str]]) -> bool:
+    def _iter_csv(self, filename: str) -> Iterator[List[str]]:
         """
-        Save data to a CSV file.
+        Yield the rows of a CSV file one at a time.
         
         Args:
-            filename: Output file path
-            data: List of rows to save
+            filename: Path to the CSV file
+            
+        Yields:
+            Each row as a list of field values
+        """
+        with open(filename, 'r', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE) as csvfile:
+            yield from csv.reader(csvfile, delimiter=self.delimiter)
+    
+    def _read_header(self, rows: Iterator[List[str]], filename: str) -> List[str]:
+        """
+        Read the header row from a row iterator, reporting any failure to open the file.
+        
+        Args:
+            rows: Rows returned by _iter_csv
+            filename: Path of the file being read, for error messages
             
         Returns:
-            True if successful, False otherwise
+            The header row, or an empty list if the file is empty or couldn't be read
         """
         try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile, delimiter=self.delimiter)
-                writer.writerows(data)
-            print(f"Successfully saved {filename}")
-            return True
+            return next(rows, [])
+        except FileNotFoundError:
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} File {filename} not found")
         except PermissionError:
-            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} No permission to write to {filename}")
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} No permission to read {filename}")
         except Exception as e:
-            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} Failed to save {filename}: {str(e)}")
-        return False
+            logging.error(f"{Fore.RED}Error:{Style.RESET_ALL} Failed to read {filename}: {str(e)}")
+        return []
+    
+    def _iter_labels(self, label_rows: Iterator[List[str]]) -> Iterator[Tuple[str, str]]:
+        """
+        Yield the (ID, label) pairs of the target rows that have the label column.
+        
+        A large target file is handed to worker processes instead of being read
+        from label_rows.
+        
+        Args:
+            label_rows: Rows returned by _iter_csv, positioned after the header
+            
+        Yields:
+            (ID, label) pairs in file order
+        """
+        workers = os.cpu_count() or 1
+        if workers > 1 and self.target_size >= PARALLEL_READ_THRESHOLD:
+            label_rows.close()
+            yield from self._read_labels_parallel(self.label_file, self.target_size, workers)
+            return
+        
+        for row in label_rows:
+            if len(row) > self.column:
+                yield row[0], row[self.column]
+    
+    def _read_labels_parallel(self, filename: str, size: int, workers: int) -> Iterator[Tuple[str, str]]:
+        """
+        Read a large target file by parsing newline-aligned byte ranges in worker processes.
+        
+        The header has already been read by the caller and is skipped. Records are
+        assumed not to contain quoted line breaks, since a chunk boundary could
+        otherwise fall inside a field.
+        
+        Args:
+            filename: Path to the CSV file
+            size: Size of the file in bytes
+            workers: Number of worker processes (and chunks)
+            
+        Yields:
+            (ID, label) pairs in file order
+        """
+        # Start after the header and move each split point forward to the start of the next line
+        with open(filename, 'rb') as csvfile:
+            csvfile.readline()
+            offsets = [csvfile.tell()]
+            for i in range(1, workers):
+                csvfile.seek(max(size * i // workers, offsets[-1]))
+                csvfile.readline()
+                offsets.append(min(csvfile.tell(), size))
+        offsets.append(size)
+        
+        tasks = [(filename, start, end, self.delimiter, self.column)
+                 for start, end in zip(offsets, offsets[1:]) if end > start]
+        if not tasks:
+            return
+        
+        # imap hands back each chunk as soon as it is parsed, in order
+        with multiprocessing.Pool(min(workers, len(tasks))) as pool:
+            for chunk in pool.imap(_parse_label_chunk, tasks):
+                yield from chunk
+    
+    def _output_format(self, filename: str) -> str:
+        """
+        Determine the format of an output file.
+        
+        Args:
+            filename: Output file path
+            
+        Returns:
+            The explicit output format if one was given, otherwise "parquet" for
+            .parquet files and "csv" for anything else
+        """
+        if self.output_format:
+            return self.output_format
+        return "parquet" if Path(filename).suffix.lower() == ".parquet" else "csv"
+    
+    def _sink_query(
+        self,
+        filename: str,
+        table: "pl.LazyFrame",
+        output_files: contextlib.ExitStack,
+        header: Optional[str] = None
+    ) -> "pl.LazyFrame":
+        """
+        Build a lazy query that streams a polars table to a CSV or Parquet file.
+        
+        Parquet output is columnar and binary, so feature values are written without
+        being formatted and quoted as text.
+        
+        Args:
+            filename: Output file path
+            table: LazyFrame to save
+            output_files: Keeps files opened here alive until the query has run
+            header: Raw header line to write in place of the polars column names (CSV only)
+            
+        Returns:
+            LazyFrame that writes the file when collected
+        """
+        if self._output_format(filename) == "parquet":
+            return table.sink_parquet(filename, compression="snappy", lazy=True)
+        if header is None:
+            return table.sink_csv(filename, separator=self.delimiter, lazy=True)
+        
+        # polars renames repeated column names, so copy the original header line instead.
+        # polars ends rows with \n, so the header is given the same line ending.
+        csvfile = output_files.enter_context(
+            open(filename, 'w', newline='', encoding='utf-8', buffering=IO_BUFFER_SIZE)
+        )
+        csvfile.write(header.rstrip('\r\n') + '\n')
+        csvfile.flush()
+        return table.sink_csv(csvfile, separator=self.delimiter, include_header=False, lazy=True)
 
 
 def main():
@@ -218,12 +742,19 @@ def main():
     parser.add_argument("-t", "--target", dest="utarget", help="Unordered target file (CSV format)")
     parser.add_argument("-c", "--column", type=int, default=1, 
                         help="Column index from target file (1-based indexing, default: 1)")
-    parser.add_argument("-x", "--x-file", dest="x_filename", default="x.csv",
-                        help="Output filename for features (default: x.csv)")
-    parser.add_argument("-y", "--y-file", dest="y_filename", default="y.csv",
-                        help="Output filename for labels (default: y.csv)")
+    parser.add_argument("-x", "--x-file", dest="x_filename", default=None,
+                        help="Output filename for features (default: x.csv, or x.parquet with --format parquet)")
+    parser.add_argument("-y", "--y-file", dest="y_filename", default=None,
+                        help="Output filename for labels (default: y.csv, or y.parquet with --format parquet)")
+    parser.add_argument("--format", dest="output_format", choices=["csv", "parquet"], default=None,
+                        help="Output file format (default: from the output file suffix, otherwise csv)")
     parser.add_argument("--delimiter", default=",", 
                         help="CSV delimiter character (default: comma)")
+    parser.add_argument("--log-unmatched", dest="unmatched_log", default=None,
+                        help="Write every dataset ID without a match in the target file to this file")
+    parser.add_argument("--engine", choices=ENGINES, default="auto",
+                        help="Code path to use: polars join, csv module, or auto to use polars only "
+                             "for Parquet output (default: auto)")
     
     args = parser.parse_args()
     
@@ -241,15 +772,15 @@ def main():
         print("=" * 80)
         return
     
-    # Check if files exist
-    dataset_path = Path(args.udataset)
-    target_path = Path(args.utarget)
+    # Check if files exist; the target stat also provides its size for the parallel reader
+    dataset_stat = _stat_or_none(args.udataset)
+    target_stat = _stat_or_none(args.utarget)
     
-    if not dataset_path.is_file():
+    if dataset_stat is None or not stat.S_ISREG(dataset_stat.st_mode):
         print(f"{Fore.RED}Error:{Style.RESET_ALL} Dataset file {args.udataset} does not exist")
         return
         
-    if not target_path.is_file():
+    if target_stat is None or not stat.S_ISREG(target_stat.st_mode):
         print(f"{Fore.RED}Error:{Style.RESET_ALL} Target file {args.utarget} does not exist")
         return
     
@@ -258,6 +789,11 @@ def main():
         print(f"{Fore.RED}Error:{Style.RESET_ALL} Column index must be greater than or equal to 1")
         return
     
+    # Default output names follow the requested format
+    extension = args.output_format or "csv"
+    args.x_filename = args.x_filename or f"x.{extension}"
+    args.y_filename = args.y_filename or f"y.{extension}"
+    
     # Process files
     print(f"Creating features file: {args.x_filename} from: {args.udataset}")
     print(f"Creating labels file: {args.y_filename} from: {args.utarget} (column: {args.column})")
@@ -268,7 +804,11 @@ def main():
         column=args.column,
         x_filename=args.x_filename,
         y_filename=args.y_filename,
-        delimiter=args.delimiter
+        delimiter=args.delimiter,
+        unmatched_log=args.unmatched_log,
+        output_format=args.output_format,
+        engine=args.engine,
+        target_size=target_stat.st_size
     )
     
     matched, unmatched = maker.process()